@@ -1,10 +1,18 @@
 import streamlit as st
 import os
 import math
+import io
+import html
+import hashlib
+import csv
 import tempfile
-from openai import OpenAI
-from moviepy.editor import VideoFileClip, AudioFileClip
+import shutil
+import subprocess
+import asyncio
 import time
+import threading
+from collections import OrderedDict
+from openai import OpenAI, AsyncOpenAI, NotFoundError, PermissionDeniedError
 
 # --- Page Config & Styling ---
 st.set_page_config(
@@ -14,50 +22,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for Whisprflow-like aesthetics
-st.markdown("""
-<style>
-    .stApp {
-        background-color: #0e1117;
-        color: #fafafa;
-    }
-    .stButton>button {
-        background-color: #ff4b4b;
-        color: white;
-        border-radius: 20px;
-        border: none;
-        padding: 10px 24px;
-        font-weight: bold;
-        transition: all 0.3s ease;
-    }
-    .stButton>button:hover {
-        background-color: #ff3333;
-        box-shadow: 0 4px 12px rgba(255, 75, 75, 0.3);
-    }
-    .transcript-box {
-        background-color: #262730;
-        padding: 20px;
-        border-radius: 10px;
-        border-left: 5px solid #ff4b4b;
-        margin-bottom: 20px;
-        font-family: 'Source Sans Pro', sans-serif;
-    }
-    .speaker-label {
-        font-weight: bold;
-        color: #ff4b4b;
-        margin-bottom: 5px;
-        display: block;
-    }
-    .timestamp {
-        color: #808495;
-        font-size: 0.8em;
-        margin-left: 10px;
-    }
-    h1, h2, h3 {
-        font-family: 'Inter', sans-serif;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for Whisprflow-like aesthetics, read from disk once per server process
+@st.cache_resource(show_spinner=False)
+def load_css():
+    css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "style.css")
+    with open(css_path, encoding="utf-8") as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # --- Sidebar ---
 with st.sidebar:
@@ -82,128 +54,309 @@ with st.sidebar:
 
 # --- Helper Functions ---
 
-def get_file_size_mb(file_path):
-    return os.path.getsize(file_path) / (1024 * 1024)
+MAX_PARALLEL_CHUNKS = 8
+# Transcripts/diarizations kept in memory; the caches are shared by all sessions
+CACHE_MAX_ENTRIES = 32
+# Cached sync clients (one per API key); bounded since each holds a user's key
+CLIENT_CACHE_MAX_ENTRIES = 8
+TRANSCRIBE_MODEL = "gpt-4o-mini-transcribe"
+FALLBACK_TRANSCRIBE_MODEL = "whisper-1"
+# Minimum interval between partial-transcript redraws while streaming
+PARTIAL_REDRAW_SECONDS = 0.5
+
+# All inputs are normalized to this target bitrate (libopus VBR, so sizes are approximate)
+AUDIO_BITRATE_KBPS = 32
+# gpt-4o-mini-transcribe rejects audio longer than 1500 s; keep some headroom
+MAX_REQUEST_SECONDS = 1400
+
+# Downmix first so the silence filters (and any buffering) work on 16 kHz mono
+DOWNMIX_FILTER = "aresample=16000,aformat=channel_layouts=mono"
+LEADING_SILENCE_FILTER = "silenceremove=start_periods=1:start_silence=0.5:start_threshold=-40dB"
+
+# Trims leading and trailing silence (the reversed pass handles the tail). areverse
+# buffers the whole clip, which is only acceptable for inputs under MAX_REQUEST_SECONDS.
+SILENCE_FILTER = f"{DOWNMIX_FILTER},{LEADING_SILENCE_FILTER},areverse,{LEADING_SILENCE_FILTER},areverse"
+
+# Streaming variant for long inputs: leading silence only, no whole-clip buffering
+CHUNKED_SILENCE_FILTER = f"{DOWNMIX_FILTER},{LEADING_SILENCE_FILTER}"
+
+def get_file_size_mb(source):
+    """Size in MB of a file path or an in-memory buffer (no stat call for buffers)."""
+    if isinstance(source, io.BytesIO):
+        return len(source.getbuffer()) / (1024 * 1024)
+    return os.path.getsize(source) / (1024 * 1024)
+
+def preprocess_audio(input_path):
+    """
+    Decodes any audio or video input into a compact in-memory Opus/Ogg stream, trimming silence.
+    Single native ffmpeg pass: drop any video stream and downmix to 16 kHz mono
+    (Whisper resamples to 16 kHz anyway) at 32 kbps, so anything within the model's
+    duration limit fits in a single upload.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-i", input_path, "-vn", "-af", SILENCE_FILTER,
+         "-c:a", "libopus", "-b:a", f"{AUDIO_BITRATE_KBPS}k", "-ar", "16000", "-ac", "1",
+         "-f", "ogg", "pipe:1"],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    return io.BytesIO(result.stdout)
+
+def preprocess_audio_chunks(input_path, chunk_duration):
+    """
+    Same decode as preprocess_audio (trimming only leading silence, so nothing buffers
+    the whole input), but the segment muxer writes chunk_duration-second Ogg chunks next
+    to input_path in that one pass, with no intermediate full-length file.
+    Returns (chunk_path, start, end) for each chunk, read from ffmpeg's segment list.
+    """
+    list_path = input_path + "_parts.csv"
+    subprocess.run(
+        ["ffmpeg", "-i", input_path, "-vn", "-af", CHUNKED_SILENCE_FILTER,
+         "-c:a", "libopus", "-b:a", f"{AUDIO_BITRATE_KBPS}k", "-ar", "16000", "-ac", "1",
+         "-f", "segment", "-segment_time", str(chunk_duration), "-reset_timestamps", "1",
+         "-segment_list", list_path, "-segment_list_type", "csv",
+         input_path + "_part_%03d.ogg"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    chunks_dir = os.path.dirname(input_path)
+    with open(list_path, newline="") as f:
+        chunks = [(os.path.join(chunks_dir, os.path.basename(name)), float(start), float(end))
+                  for name, start, end in csv.reader(f)]
+    return chunks
 
-def transcribe_chunk(client, file_path):
-    """Transcribes a single audio file chunk."""
-    with open(file_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1", 
-            file=audio_file,
+def get_audio_duration(file_path):
+    """Reads the media duration (seconds) from the container header via ffprobe."""
+    output = subprocess.check_output(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=nw=1:nk=1", file_path]
+    )
+    return float(output)
+
+async def transcribe_chunk(client, audio, on_partial=None):
+    """
+    Transcribes a single audio chunk with an AsyncOpenAI client, given as a file path
+    or an in-memory (name, file, mime) tuple.
+    Streams the result and reports the text so far to on_partial (if given) at most
+    every PARTIAL_REDRAW_SECONDS, plus once when done; falls back to whisper-1 if the streaming model is unavailable.
+    """
+    if not isinstance(audio, tuple):
+        with open(audio, "rb") as audio_file:
+            return await transcribe_chunk(client, (os.path.basename(audio), audio_file), on_partial)
+
+    try:
+        # gpt-4o transcription models only take response_format="json"; the streamed
+        # events don't depend on it, so it is left at the default here
+        stream = await client.audio.transcriptions.create(
+            model=TRANSCRIBE_MODEL,
+            file=audio,
+            stream=True
+        )
+        parts = []
+        last_redraw = time.monotonic()
+        # Closing the stream releases this chunk's HTTP connection as soon as it's done
+        async with stream:
+            async for event in stream:
+                if event.type == "transcript.text.delta":
+                    parts.append(event.delta)
+                    if on_partial and time.monotonic() - last_redraw >= PARTIAL_REDRAW_SECONDS:
+                        on_partial("".join(parts))
+                        last_redraw = time.monotonic()
+                elif event.type == "transcript.text.done":
+                    if on_partial:
+                        on_partial(event.text)
+                    return event.text
+        return "".join(parts)
+    except (NotFoundError, PermissionDeniedError):
+        # Only the model being unavailable triggers the fallback; other errors surface
+        audio[1].seek(0)
+        transcription = await client.audio.transcriptions.create(
+            model=FALLBACK_TRANSCRIBE_MODEL, 
+            file=audio,
             response_format="text"
         )
-    return transcription
+        return transcription
 
-def diarize_with_gpt4(client, transcript_text):
-    """Uses GPT-4o to format the transcript with speaker labels."""
+@st.cache_resource(show_spinner=False, max_entries=CLIENT_CACHE_MAX_ENTRIES)
+def get_client(api_key: str) -> OpenAI:
+    """
+    One OpenAI client per API key, so its HTTP connection pool is reused across reruns
+    (used for diarization). Chunk transcription needs an AsyncOpenAI bound to its own
+    event loop, so _transcribe_file creates that per run.
+    """
+    return OpenAI(api_key=api_key)
+
+def get_file_hash(uploaded_file):
+    """SHA-256 of the uploaded bytes, used as the cache key for transcripts."""
+    return hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+
+# Arguments prefixed with "_" are excluded from the Streamlit cache key.
+# Errors propagate out of the cached functions so failures are never cached.
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def _cached_diarize(file_hash, transcript_text, _client):
+    response = _client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": "You are a professional transcriber. Your task is to format the following raw transcript into a readable script. \n1. Identify different speakers (Speaker 1, Speaker 2, etc.) based on context, tone changes, and flow. \n2. Add paragraph breaks and the speaker stamps for readability. \n3. Do not summarize; keep the full content. \n4. If it's a monologue, label it as 'Speaker 1' and format it nicely. \n5. Long recordings arrive as consecutive chunks, each prefixed with its time range like [0-1400s]. A speaker may continue across a chunk boundary, so keep labels consistent across chunks, and leave the markers out of your output."},
+            {"role": "user", "content": transcript_text}
+        ],
+        temperature=0.3
+    )
+    return response.choices[0].message.content
+
+def join_transcript(transcript_chunks):
+    """Plain transcript text from (start, end, text) chunks."""
+    return " ".join(text for _, _, text in transcript_chunks)
+
+def format_diarization_batch(transcript_chunks):
+    """One GPT-4o prompt for all (start, end, text) chunks, each tagged with its time range."""
+    return "\n\n".join(f"[{start:.0f}-{end:.0f}s] {text}" for start, end, text in transcript_chunks)
+
+def diarize_with_gpt4(client, transcript_chunks, file_hash):
+    """
+    Uses GPT-4o to format the transcript with speaker labels (cached per upload).
+    Everything goes out in a single call, so labels stay consistent across chunk edges;
+    chunked transcripts are tagged with each chunk's time range.
+    """
+    if len(transcript_chunks) == 1:
+        prompt = transcript_chunks[0][2]
+    else:
+        prompt = format_diarization_batch(transcript_chunks)
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a professional transcriber. Your task is to format the following raw transcript into a readable script. \n1. Identify different speakers (Speaker 1, Speaker 2, etc.) based on context, tone changes, and flow. \n2. Add paragraph breaks and the speaker stamps for readability. \n3. Do not summarize; keep the full content. \n4. If it's a monologue, label it as 'Speaker 1' and format it nicely."},
-                {"role": "user", "content": transcript_text}
-            ],
-            temperature=0.3
-        )
-        return response.choices[0].message.content
+        return _cached_diarize(file_hash, prompt, client)
     except Exception as e:
         st.error(f"Diarization error: {e}")
-        return transcript_text
+        return join_transcript(transcript_chunks)
 
-def process_and_transcribe(client, input_path, status_container):
-    """
-    Handles the logic of checking file size, extracting audio (if video),
-    splitting into chunks (if needed), and transcribing.
-    """
-    temp_files_to_cleanup = []
-    full_transcript = ""
+# Transcription writes status/progress into a container owned by the caller, which
+# st.cache_data can't replay on a hit, so results are memoized explicitly instead.
+@st.cache_resource(show_spinner=False)
+def _transcript_cache():
+    """Process-wide LRU of (start, end, text) chunk lists by upload hash."""
+    return OrderedDict(), threading.Lock()
+
+def _get_cached_transcript(file_hash):
+    cache, lock = _transcript_cache()
+    with lock:
+        if file_hash in cache:
+            cache.move_to_end(file_hash)
+        return cache.get(file_hash)
+
+def _store_transcript(file_hash, transcript_chunks):
+    cache, lock = _transcript_cache()
+    with lock:
+        cache[file_hash] = transcript_chunks
+        cache.move_to_end(file_hash)
+        while len(cache) > CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+async def _transcribe_file(api_key, input_path, status_container):
+    # Scratch files are written next to input_path, inside the caller's TemporaryDirectory
+    # The async client's connection pool is tied to this event loop, so it lives for one run
+    client = AsyncOpenAI(api_key=api_key)
+    transcript_chunks = []
     
     try:
         # 1. Identify if it's video or audio
         file_ext = os.path.splitext(input_path)[1].lower()
-        audio_path = input_path
 
-        # If video, extract audio first
-        if file_ext in ['.mp4', '.mov', '.avi', '.mkv']:
-            status_container.info("🎬 Extracting audio from video...")
-            audio_path = input_path + ".mp3"
-            
-            # Use a custom logger or None to avoid the stdout error
-            # We wrap in try/except to handle the specific moviepy error if it occurs
-            try:
-                video = VideoFileClip(input_path)
-                video.audio.write_audiofile(audio_path, verbose=False, logger=None)
-                video.close()
-            except AttributeError:
-                # Fallback for the 'NoneType' stdout error - sometimes logger=None causes it in certain envs
-                # We try again with default logger but suppress output via other means if possible
-                # Or just ignore if the file was actually created
-                if not os.path.exists(audio_path):
-                     # Try one more time with a simple print logger
-                     video = VideoFileClip(input_path)
-                     video.audio.write_audiofile(audio_path, verbose=False)
-                     video.close()
-
-            temp_files_to_cleanup.append(audio_path)
-
-        # 2. Check file size and determine chunking strategy
-        file_size_mb = get_file_size_mb(audio_path)
+        # 2. Decide from the source duration whether one request can take it, so long
+        # inputs can be decoded straight into chunks. Unknown durations go the chunked way.
         OPENAI_LIMIT_MB = 25
         SAFETY_BUFFER_MB = 20
+        
+        # Seconds per request: what fits in SAFETY_BUFFER_MB at the normalized bitrate,
+        # capped by the model's duration limit
+        chunk_duration = min(
+            math.floor((SAFETY_BUFFER_MB * 8 * 1024) / AUDIO_BITRATE_KBPS),
+            MAX_REQUEST_SECONDS
+        )
+        try:
+            duration = get_audio_duration(input_path)
+        except ValueError:
+            duration = math.inf
 
-        if file_size_mb <= OPENAI_LIMIT_MB:
+        audio_buffer = None
+        if duration <= chunk_duration:
+            # Extract audio (if video) and trim silence before any size decisions
+            if file_ext in ['.mp4', '.mov', '.avi', '.mkv']:
+                status_container.info("🎬 Extracting audio from video...")
+            else:
+                status_container.info("🔇 Trimming silence...")
+            audio_buffer = preprocess_audio(input_path)
+            file_size_mb = get_file_size_mb(audio_buffer)
+
+        if audio_buffer is not None and file_size_mb <= OPENAI_LIMIT_MB:
             status_container.info(f"⚡ File is small ({file_size_mb:.2f} MB). Transcribing directly...")
-            full_transcript = transcribe_chunk(client, audio_path)
-        else:
-            status_container.info(f"📦 File is large ({file_size_mb:.2f} MB). Splitting into optimized chunks...")
             
-            audio = AudioFileClip(audio_path)
-            duration = audio.duration
+            # Render the partial transcript as it streams in
+            def show_partial(text):
+                status_container.info(f"📝 {text}")
             
-            chunk_duration = (SAFETY_BUFFER_MB / file_size_mb) * duration
-            chunk_duration = max(10, math.floor(chunk_duration))
+            text = await transcribe_chunk(client, ("audio.ogg", audio_buffer, "audio/ogg"), show_partial)
+            # Single chunk; its time range is never shown, so the end is left unknown
+            transcript_chunks = [(0, None, text)]
+        else:
+            status_container.info("📦 File is large. Splitting into optimized chunks...")
             
-            num_chunks = math.ceil(duration / chunk_duration)
+            # Phase 1: extract, trim, encode and split in a single ffmpeg pass
+            chunks = preprocess_audio_chunks(input_path, chunk_duration)
+            if not chunks:
+                # e.g. fully silent input trimmed to nothing; raise so it isn't cached
+                raise ValueError("No audio left to transcribe after trimming silence.")
+            chunk_filenames = [chunk_filename for chunk_filename, _, _ in chunks]
+            chunk_times = [(start_time, end_time) for _, start_time, end_time in chunks]
+            num_chunks = len(chunks)
             
+            # Phase 2: transcribe chunks concurrently (the API calls are network-bound)
             progress_bar = status_container.progress(0)
-
-            for i in range(num_chunks):
-                start_time = i * chunk_duration
-                end_time = min((i + 1) * chunk_duration, duration)
-                
-                chunk_filename = f"{audio_path}_part_{i}.mp3"
-                temp_files_to_cleanup.append(chunk_filename)
-                
-                # Create chunk
-                sub_clip = audio.subclip(start_time, end_time)
-                sub_clip.write_audiofile(chunk_filename, verbose=False, logger=None)
-                sub_clip.close()
-                
-                # Transcribe chunk
-                # status_container.text(f"Transcribing chunk {i+1}/{num_chunks}...")
-                chunk_text = transcribe_chunk(client, chunk_filename)
-                full_transcript += chunk_text + " "
-                
-                # Update progress
-                progress_bar.progress((i + 1) / num_chunks)
+            semaphore = asyncio.Semaphore(MAX_PARALLEL_CHUNKS)
+            
+            async def transcribe_limited(chunk_filename):
+                async with semaphore:
+                    return await transcribe_chunk(client, chunk_filename)
+            
+            tasks = [asyncio.ensure_future(transcribe_limited(chunk_filename)) for chunk_filename in chunk_filenames]
+            
+            # Update progress as chunks finish
+            for done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                await next_done
+                progress_bar.progress(done / num_chunks)
+            
+            # Rebuild the transcript in submission order
+            parts = await asyncio.gather(*tasks)
+            transcript_chunks = [(start, end, text) for (start, end), text in zip(chunk_times, parts)]
             
-            audio.close()
             progress_bar.empty()
 
+    finally:
+        await client.close()
+
+    return transcript_chunks
+
+def process_and_transcribe(api_key, input_path, status_container, file_hash):
+    """
+    Handles the logic of checking file size, extracting audio (if video),
+    splitting into chunks (if needed), and transcribing.
+    Results are cached by file_hash, so re-running on the same upload skips the API.
+    Returns the transcript as a list of (start, end, text) chunks, or None on error.
+    """
+    transcript_chunks = _get_cached_transcript(file_hash)
+    if transcript_chunks is not None:
+        return transcript_chunks
+    
+    try:
+        transcript_chunks = asyncio.run(_transcribe_file(api_key, input_path, status_container))
     except Exception as e:
         st.error(f"An error occurred: {e}")
         return None
-    finally:
-        # Cleanup temp files
-        for f in temp_files_to_cleanup:
-            if os.path.exists(f):
-                try:
-                    os.remove(f)
-                except:
-                    pass
-
-    return full_transcript
+    
+    _store_transcript(file_hash, transcript_chunks)
+    return transcript_chunks
 
 # --- Main UI Logic ---
 
@@ -222,43 +375,27 @@ with tab1:
         if not api_key_input:
             st.error("Please provide an API Key in the sidebar.")
         else:
-            client = OpenAI(api_key=api_key_input)
+            client = get_client(api_key_input)
             status_box = st.empty()
             
+            file_hash = get_file_hash(uploaded_file)
+            
             with st.spinner("Processing your file..."):
-                # Save to temp
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_file_path = tmp_file.name
-                
-                raw_transcript = process_and_transcribe(client, tmp_file_path, status_box)
-                
-                # Ensure we close any potential file handles
-                if 'video' in locals():
-                    try:
-                        video.close()
-                    except:
-                        pass
-                
-                # Robust file deletion
-                if os.path.exists(tmp_file_path):
-                    max_retries = 3
-                    for i in range(max_retries):
-                        try:
-                            os.remove(tmp_file_path)
-                            break
-                        except PermissionError:
-                            time.sleep(1.0)
-                        except Exception as e:
-                            print(f"Error deleting temp file: {e}")
-                            break
+                # Save to a temp dir that is removed as a whole once we're done
+                with tempfile.TemporaryDirectory() as td:
+                    tmp_file_path = os.path.join(td, "upload" + os.path.splitext(uploaded_file.name)[1])
+                    with open(tmp_file_path, "wb") as tmp_file:
+                        uploaded_file.seek(0)
+                        shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+                    
+                    transcript_chunks = process_and_transcribe(api_key_input, tmp_file_path, status_box, file_hash)
                 
-                if raw_transcript:
+                if transcript_chunks:
                     if enable_diarization:
                         status_box.info("🤖 AI is identifying speakers and formatting...")
-                        transcript_result = diarize_with_gpt4(client, raw_transcript)
+                        transcript_result = diarize_with_gpt4(client, transcript_chunks, file_hash)
                     else:
-                        transcript_result = raw_transcript
+                        transcript_result = join_transcript(transcript_chunks)
                     
                     status_box.success("Done!")
 
@@ -270,37 +407,28 @@ with tab2:
         if not api_key_input:
             st.error("Please provide an API Key in the sidebar.")
         else:
-            client = OpenAI(api_key=api_key_input)
+            client = get_client(api_key_input)
             status_box = st.empty()
             
+            file_hash = get_file_hash(audio_value)
+            
             with st.spinner("Transcribing recording..."):
-                # Save audio_value (BytesIO) to a temp file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                    tmp_file.write(audio_value.getvalue())
-                    tmp_file_path = tmp_file.name
-                
-                # Transcribe directly (recordings are usually small enough, but we use the safe function anyway)
-                raw_transcript = process_and_transcribe(client, tmp_file_path, status_box)
-                
-                # Robust file deletion for dictation
-                if os.path.exists(tmp_file_path):
-                    max_retries = 3
-                    for i in range(max_retries):
-                        try:
-                            os.remove(tmp_file_path)
-                            break
-                        except PermissionError:
-                            time.sleep(1.0)
-                        except Exception as e:
-                            print(f"Error deleting temp file: {e}")
-                            break
+                # Save audio_value (BytesIO) to a temp dir that is removed as a whole once we're done
+                with tempfile.TemporaryDirectory() as td:
+                    tmp_file_path = os.path.join(td, "recording.wav")
+                    with open(tmp_file_path, "wb") as tmp_file:
+                        audio_value.seek(0)
+                        shutil.copyfileobj(audio_value, tmp_file, length=1024 * 1024)
                     
-                if raw_transcript:
+                    # Transcribe directly (recordings are usually small enough, but we use the safe function anyway)
+                    transcript_chunks = process_and_transcribe(api_key_input, tmp_file_path, status_box, file_hash)
+                
+                if transcript_chunks:
                     if enable_diarization:
                         status_box.info("🤖 AI is identifying speakers and formatting...")
-                        transcript_result = diarize_with_gpt4(client, raw_transcript)
+                        transcript_result = diarize_with_gpt4(client, transcript_chunks, file_hash)
                     else:
-                        transcript_result = raw_transcript
+                        transcript_result = join_transcript(transcript_chunks)
                     status_box.success("Done!")
 
 # --- Display Results ---
@@ -308,8 +436,8 @@ if transcript_result:
     st.markdown("---")
     st.subheader("📝 Transcript")
     
-    # Display in a styled box
-    st.markdown(f'<div class="transcript-box">{transcript_result.replace(chr(10), "<br>")}</div>', unsafe_allow_html=True)
+    # Display in a styled box; the text is escaped and line breaks are kept by CSS (pre-wrap)
+    st.html(f'<div class="transcript-box">{html.escape(transcript_result)}</div>')
     
     # Download options
     col1, col2 = st.columns(2)